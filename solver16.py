@@ -25,94 +25,320 @@
 # (manhattan distances)/3 is the lower bound of cost for solving any board if 3 tiles can move in 1 move
 #  unhindered to its goal position. we are also adding linear conflict cost to priority function here since it takes
 # minimum 2 extra moves to put a pair of tiles already in their goal row or columns but in reversed order(the source
-# cited in code comments). Lesser the priority the more promising the state is. Using heapq we pick the successor with
-# the least priority and explore its successors.
+# cited in code comments). Lesser the priority the more promising the state is. Using a priority queue we pick the
+# successor with the least priority and explore its successors.
+# Optionally ('pdb' on the command line) the heuristic uses additive pattern databases instead, when they give a larger
+# estimate than manhattan distances and linear conflicts (see PATTERNS).
 
 
+import os
 import sys
-import copy
+import zlib
 import heapq
+import itertools
+import collections
 
-goal_tiles = [[1, 2, 3, 4], [5, 6, 7, 8], [9, 10, 11, 12], [13, 14, 15, 0]]
-goal_cols = [[1, 5, 9, 13], [2, 6, 10, 14], [3, 7, 11, 15], [4, 8, 12, 0]]
+# The board is packed into a single 64 bit integer with 4 bits per tile. The tile at row r and column c is stored at
+# the nibble starting from bit SHIFT[r][c]. Moving tiles around then becomes a few shifts and masks on one integer
+# instead of copying nested lists, and two boards can be compared (or hashed) in O(1).
+SHIFT = [[4 * (4 * r + c) for c in range(0, 4)] for r in range(0, 4)]
+GOAL_PACKED = 0x0FEDCBA987654321
 
 
-# manhattan distance is the sum of vertical and horizontal distances of all the
-# misplaced tiles from its goal position
-def calc_manhattan_distance(tiles):
-    manhattan_distance = 0
+def pack_tiles(tiles):
+    packed = 0
     for r in range(0, 4):
         for c in range(0, 4):
-            manhattan_distance += distance_to_goal_position(tiles, r, c)
+            packed |= tiles[r][c] << SHIFT[r][c]
+    return packed
 
-    return manhattan_distance
 
+def unpack_tiles(packed):
+    return [[tile_at(packed, r, c) for c in range(0, 4)] for r in range(0, 4)]
 
-# vertical and horizontal distance of a tile from its goal position
-def distance_to_goal_position(tiles, r, c):
-    if tiles[r][c] is 0:
-        return 0
-    else:
-        return abs((tiles[r][c] - 1) / 4 - r) + abs((tiles[r][c] - 1) % 4 - c)
+
+def tile_at(packed, r, c):
+    return (packed >> SHIFT[r][c]) & 0xF
 
 
-def calc_horizontal_conflicts(tiles):
-    conflicts = 0
+# find the coordinates of the empty tile
+def find_empty_tile(packed):
     for r in range(0, 4):
         for c in range(0, 4):
-            if tiles[r][c] is not 0 and tiles[r][c] in goal_tiles[r]:
-                for c1 in range(c + 1, 4):
-                    if tiles[r][c1] is not 0 and tiles[r][c1] in goal_tiles[r] \
-                            and tiles[r][c] > tiles[r][c1]:
-                        conflicts += 2
-    return conflicts
+            if tile_at(packed, r, c) == 0:
+                return r, c
+
+
+# Tables for measuring how far a board is from a goal board, precomputed once so that the heuristic is only table
+# lookups. The solver searches towards GOAL, while the backward half of the bidirectional search uses the initial board
+# as its goal.
+class Goal:
+    def __init__(self, packed, pattern_dbs=None):
+        self.packed = packed
+        # pattern databases are only available for the standard goal and only used when asked for, see
+        # load_pattern_dbs()
+        self.pattern_dbs = pattern_dbs
+        # goal row and column of every tile. The empty tile gets -1 so it never counts as being in its goal row or
+        # column.
+        self.row = [-1] * 16
+        self.col = [-1] * 16
+        for r in range(0, 4):
+            for c in range(0, 4):
+                tile = tile_at(packed, r, c)
+                if tile != 0:
+                    self.row[tile] = r
+                    self.col[tile] = c
+        # row_order[r][tile] is the goal column of the tile if its goal row is r, otherwise -1, and col_order[c][tile]
+        # likewise the goal row of the tile if its goal column is c. Looking a tile up tells both if it is in its goal
+        # line and where it should be along that line.
+        self.row_order = [[self.col[tile] if self.row[tile] == r else -1 for tile in range(0, 16)]
+                          for r in range(0, 4)]
+        self.col_order = [[self.row[tile] if self.col[tile] == c else -1 for tile in range(0, 16)]
+                          for c in range(0, 4)]
+        # md[tile][pos] is the manhattan distance of the tile placed at position pos (= 4 * r + c) from its goal
+        # position
+        self.md = [[0] * 16 for _ in range(0, 16)]
+        for tile in range(1, 16):
+            for pos in range(0, 16):
+                self.md[tile][pos] = abs(self.row[tile] - pos // 4) + abs(self.col[tile] - pos % 4)
+
+
+# Additive pattern database heuristic. The tiles are split into the disjoint patterns below, one per goal row, and for
+# every placement of a pattern's tiles the database stores the least number of moves of those tiles (sliding k tiles
+# counts as k moves, like manhattan distance) to bring them home, the other tiles being treated as interchangeable
+# blanks. Moves of different patterns never overlap so the databases can be added up. Each database is exact for its
+# tiles, while the linear conflicts here charge 2 moves for every conflicting pair, which overestimates when a line has
+# several of them: first row 4 3 2 1 with everything else solved has manhattan distance 8, conflicts 12 but needs only
+# 16 moves. So the database can fall below manhattan distance plus linear conflicts even within a single pattern.
+# The tiles of a pattern are consecutive, so a placement is indexed by 4 bits per tile holding its position, which is
+# just a slice of the board's positions (see Board).
+PATTERNS = [(1, 2, 3, 4), (5, 6, 7, 8), (9, 10, 11, 12), (13, 14, 15)]
+PATTERN_DB_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'solver16.pdb')
+
+# positions next to each position on the board
+NEIGHBORS = [[pos + step for step, ok in ((-4, pos >= 4), (4, pos < 12), (-1, pos % 4 > 0), (1, pos % 4 < 3)) if ok]
+             for pos in range(0, 16)]
+
+
+# Build the database of a pattern by a 0-1 breadth first search backward from the goal over states of (position of the
+# empty tile, positions of the pattern tiles). Moving the empty tile over a tile outside the pattern costs nothing and
+# over a pattern tile costs 1, so the former are explored first.
+def build_pattern_db(tiles):
+    bits = 4 * len(tiles)
+    mask = (1 << bits) - 1
+    goal = 0
+    for i, tile in enumerate(tiles):
+        goal |= (tile - 1) << (4 * i)
+
+    moves = bytearray(b'\xff') * (16 << bits)
+    queue = collections.deque()
+    for pos in range(0, 16):
+        if pos + 1 not in tiles:
+            moves[(pos << bits) | goal] = 0
+            queue.append((pos << bits) | goal)
+
+    while queue:
+        state = queue.popleft()
+        state_moves = moves[state]
+        empty = state >> bits
+        placement = state & mask
+        shift_at = {}
+        for shift in range(0, bits, 4):
+            shift_at[(placement >> shift) & 0xF] = shift
+        for pos in NEIGHBORS[empty]:
+            if pos in shift_at:
+                # the pattern tile at pos slides into the empty position
+                next_state = (pos << bits) | (placement ^ ((pos ^ empty) << shift_at[pos]))
+                if moves[next_state] > state_moves + 1:
+                    moves[next_state] = state_moves + 1
+                    queue.append(next_state)
+            else:
+                next_state = (pos << bits) | placement
+                if moves[next_state] > state_moves:
+                    moves[next_state] = state_moves
+                    queue.appendleft(next_state)
 
+    # the position of the empty tile doesn't matter for the heuristic, keep the least moves over all of them
+    pattern_db = bytearray(1 << bits)
+    for placement in range(0, 1 << bits):
+        pattern_db[placement] = min(moves[(pos << bits) | placement] for pos in range(0, 16))
+    return pattern_db
 
-def calc_vertical_conflicts(tiles):
-    conflicts = 0
-    for c in range(0, 4):
-        for r in range(0, 4):
-            if tiles[r][c] is not 0 and tiles[r][c] in goal_cols[c]:
-                for r1 in range(r + 1, 4):
-                    if tiles[r1][c] is not 0 and tiles[r1][c] in goal_cols[c] \
-                            and tiles[r][c] > tiles[r1][c]:
-                        conflicts += 2
-    return conflicts
 
+# first line of the database file: the patterns it was built for and a checksum of the databases following it
+def pattern_db_header(data):
+    return '{!r} {}\n'.format(PATTERNS, zlib.crc32(bytes(data)) & 0xFFFFFFFF).encode('ascii')
 
-def swap_and_get_new_tiles(tiles, r1, c1, r2, c2):
-    new_tiles = copy.deepcopy(tiles)
-    new_tiles[r1][c1], new_tiles[r2][c2] = new_tiles[r2][c2], new_tiles[r1][c1]
-    return new_tiles
 
+# The databases take a few seconds to build, so they are built on the first run and saved next to this script. The
+# file is rebuilt when it was made for other PATTERNS or doesn't match its checksum.
+def load_pattern_dbs():
+    sizes = [1 << (4 * len(tiles)) for tiles in PATTERNS]
+    try:
+        with open(PATTERN_DB_FILE, 'rb') as file:
+            header, _, data = file.read().partition(b'\n')
+    except IOError:
+        header, data = b'', b''
 
-def diff_manhattan_dist_on_row(tiles1, tiles2, r0):
-    delta_md = 0
-    for c in range(0, 4):
-        if tiles1[r0][c] != tiles2[r0][c]:
-            delta_md += distance_to_goal_position(tiles1, r0, c) - distance_to_goal_position(tiles2, r0, c)
-    return delta_md
+    if len(data) != sum(sizes) or header + b'\n' != pattern_db_header(data):
+        data = bytearray().join(build_pattern_db(tiles) for tiles in PATTERNS)
+        try:
+            with open(PATTERN_DB_FILE, 'wb') as file:
+                file.write(pattern_db_header(data) + data)
+        except IOError:
+            pass
 
+    # bytearray indexes to ints on Python 2 as well, where slices of the file contents are str
+    pattern_dbs = []
+    start = 0
+    for size in sizes:
+        pattern_dbs.append(bytearray(data[start:start + size]))
+        start += size
+    return pattern_dbs
 
-def diff_manhattan_dist_on_col(tiles1, tiles2, c0):
-    delta_md = 0
-    for r in range(0, 4):
-        if tiles1[r][c0] != tiles2[r][c0]:
-            delta_md += distance_to_goal_position(tiles1, r, c0) - distance_to_goal_position(tiles2, r, c0)
-    return delta_md
+
+# positions of the tiles as 4 bits per tile, the tile t at bits 4 * t
+def calc_positions(packed):
+    positions = 0
+    for pos in range(0, 16):
+        positions |= pos << (4 * ((packed >> (4 * pos)) & 0xF))
+    return positions
+
+
+# sum of the pattern databases, one 4 tile slice of the positions per pattern in PATTERNS
+def calc_pattern_distance(positions, pattern_dbs):
+    return (pattern_dbs[0][(positions >> 4) & 0xFFFF] + pattern_dbs[1][(positions >> 20) & 0xFFFF] +
+            pattern_dbs[2][(positions >> 36) & 0xFFFF] + pattern_dbs[3][positions >> 52])
+
+
+GOAL = Goal(GOAL_PACKED)
+
+
+# manhattan distance is the sum of vertical and horizontal distances of all the
+# misplaced tiles from its goal position
+def calc_manhattan_distance(packed, goal):
+    md = goal.md
+    manhattan_distance = 0
+    for pos in range(0, 16):
+        manhattan_distance += md[(packed >> (4 * pos)) & 0xF][pos]
+
+    return manhattan_distance
+
+
+# linear conflicts of a single row or column. These are kept per row and per column on the board so that a successor
+# only needs to recount the rows and columns touched by its slide.
+# Two tiles in their goal row are in conflict when they are in the reverse order of their goal columns (and the other
+# way round for columns). w > x >= 0 holds only if both tiles are in their goal line and in the wrong order.
+def calc_row_conflicts(packed, r, goal):
+    order = goal.row_order[r]
+    line = packed >> SHIFT[r][0]
+    w = order[line & 0xF]
+    x = order[(line >> 4) & 0xF]
+    y = order[(line >> 8) & 0xF]
+    z = order[(line >> 12) & 0xF]
+    return 2 * ((w > x >= 0) + (w > y >= 0) + (w > z >= 0) + (x > y >= 0) + (x > z >= 0) + (y > z >= 0))
+
+
+def calc_col_conflicts(packed, c, goal):
+    order = goal.col_order[c]
+    line = packed >> SHIFT[0][c]
+    w = order[line & 0xF]
+    x = order[(line >> 16) & 0xF]
+    y = order[(line >> 32) & 0xF]
+    z = order[(line >> 48) & 0xF]
+    return 2 * ((w > x >= 0) + (w > y >= 0) + (w > z >= 0) + (x > y >= 0) + (x > z >= 0) + (y > z >= 0))
+
+
+# A move is encoded as a small int (direction << 12) | (number of tiles slid << 8) | (index of row or column) and is
+# only turned into its 'D21'-like label when the solution is printed
+DOWN, UP, RIGHT, LEFT = 0, 1, 2, 3
+MOVE_LABELS = 'DURL'
+
+
+def encode_move(direction, count, index):
+    return (direction << 12) | (count << 8) | index
+
+
+def format_move(move):
+    return '{}{}{}'.format(MOVE_LABELS[move >> 12], (move >> 8) & 0xF, (move & 0xFF) + 1)
+
+
+# the move undoing the given one slides the same tiles back, i.e. D <-> U and R <-> L
+def invert_move(move):
+    return move ^ (1 << 12)
+
+
+# Generate all successors of a board as (packed, r0, c0, move, delta_md) tuples, where r0 and c0 locate the empty tile
+# on the successor and delta_md is its manhattan distance to the goal minus that of the given board.
+# Each successor slides one more tile than the previous one in the same direction. Since the empty tile is 0, moving a
+# tile into it is xor-ing the tile into both positions, and only that tile's manhattan distance changes.
+# prev_move is the move which produced the board (None for the initial board). Sliding along the same column or row
+# again, including sliding the tiles back, only reaches boards which are one slide away from the previous board (or the
+# previous board itself), and those were already generated with lesser cost. So only perpendicular slides are
+# generated, which is checked on the move code before any successor is built.
+def expand(packed, r0, c0, goal, prev_move=None):
+    md = goal.md
+    successors = []
+    # move >> 13 is 0 for vertical and 1 for horizontal slides
+    vertical = prev_move is None or prev_move >> 13 != 0
+    horizontal = prev_move is None or prev_move >> 13 != 1
+
+    # slide down the tiles above the empty tile
+    new_packed, delta_md = packed, 0
+    for r in range(r0 - 1 if vertical else -1, -1, -1):
+        tile = tile_at(new_packed, r, c0)
+        new_packed ^= (tile << SHIFT[r][c0]) ^ (tile << SHIFT[r + 1][c0])
+        delta_md += md[tile][4 * (r + 1) + c0] - md[tile][4 * r + c0]
+        successors.append((new_packed, r, c0, encode_move(DOWN, r0 - r, c0), delta_md))
+
+    # slide up the tiles below the empty tile
+    new_packed, delta_md = packed, 0
+    for r in range(r0 + 1 if vertical else 4, 4):
+        tile = tile_at(new_packed, r, c0)
+        new_packed ^= (tile << SHIFT[r][c0]) ^ (tile << SHIFT[r - 1][c0])
+        delta_md += md[tile][4 * (r - 1) + c0] - md[tile][4 * r + c0]
+        successors.append((new_packed, r, c0, encode_move(UP, r - r0, c0), delta_md))
+
+    # slide right the tiles on the left of the empty tile
+    new_packed, delta_md = packed, 0
+    for c in range(c0 - 1 if horizontal else -1, -1, -1):
+        tile = tile_at(new_packed, r0, c)
+        new_packed ^= (tile << SHIFT[r0][c]) ^ (tile << SHIFT[r0][c + 1])
+        delta_md += md[tile][4 * r0 + c + 1] - md[tile][4 * r0 + c]
+        successors.append((new_packed, r0, c, encode_move(RIGHT, c0 - c, r0), delta_md))
+
+    # slide left the tiles on the right of the empty tile
+    new_packed, delta_md = packed, 0
+    for c in range(c0 + 1 if horizontal else 4, 4):
+        tile = tile_at(new_packed, r0, c)
+        new_packed ^= (tile << SHIFT[r0][c]) ^ (tile << SHIFT[r0][c - 1])
+        delta_md += md[tile][4 * r0 + c - 1] - md[tile][4 * r0 + c]
+        successors.append((new_packed, r0, c, encode_move(LEFT, c - c0, r0), delta_md))
+
+    return successors
 
 
 class Board:
-    def __init__(self, prev, tiles, move, delta_md):
+    # a board is created for every successor pushed on the fringe, so its attributes are kept in slots instead of a
+    # per instance dict to cut down the memory each one takes
+    __slots__ = ('prev', 'packed', 'goal', 'r0', 'c0', 'cost', 'manhattan_distance', 'move', 'line_conflicts',
+                 'linear_conflicts', 'positions', 'pattern_distance', 'priority')
+
+    def __init__(self, prev, packed, r0, c0, move, delta_md, goal=GOAL):
         self.prev = prev
-        self.tiles = tiles
+        self.packed = packed
+        # successors are measured against the same goal as their initial board
+        self.goal = goal if prev is None else prev.goal
+        # coordinates of the empty tile, known from the move that produced this board
+        self.r0 = r0
+        self.c0 = c0
         if prev is None:
             self.cost = 0
-            self.manhattan_distance = calc_manhattan_distance(tiles)
+            self.manhattan_distance = calc_manhattan_distance(packed, self.goal)
         else:
             self.cost = prev.cost + 1
-            # Because successors and previous board are different for only 1 column or row, calculate difference of
-            # manhattan distances of that particular row or column and add the difference to parent's manhattan
+            # Because successors and previous board are different only for the tiles that were slid, expand()
+            # calculates the difference of manhattan distances of those tiles and it is added to parent's manhattan
             # distance to get manhattan distance for successors.
             # The idea comes from http://coursera.cs.princeton.edu/algs4/checklists/8puzzle.html where it says for
             # single moves the difference in manhattan distance between a board and its neighbor is either -1 or +1.
@@ -121,70 +347,70 @@ class Board:
 
         # the idea of using linear conflicts comes from Algorithms course on Coursera
         # http://coursera.cs.princeton.edu/algs4/checklists/8puzzle.html
-        self.linear_conflicts = calc_horizontal_conflicts(tiles) + calc_vertical_conflicts(tiles)
-        self.priority = self.cost + self.manhattan_distance + self.linear_conflicts
-        self.successors = []
-        self.r0 = 0
-        self.c0 = 0
-
-    def get_successors(self):
-
-        if not self.successors:
-            # find the coordinates of the empty tiles first
+        # A slide changes only the rows and columns between the old and the new empty tile, so the successor takes
+        # parent's per row and per column conflicts and recounts only those. They are packed into one int with 4 bits
+        # for each row (bits 0 to 15) and column (bits 16 to 31), since a line has at most 12 conflicts.
+        if prev is None:
+            self.line_conflicts = 0
+            self.linear_conflicts = 0
             for r in range(0, 4):
-                for c in range(0, 4):
-                    if self.tiles[r][c] is 0:
-                        self.r0 = r
-                        self.c0 = c
-                        break
-
-            self.slide_down_and_add_successors(self.tiles, self.r0)
-            self.slide_up_and_add_successors(self.tiles, self.r0)
-            self.slide_right_and_add_successors(self.tiles, self.c0)
-            self.slide_left_and_add_successors(self.tiles, self.c0)
-
-        return self.successors
-
-    def slide_down_and_add_successors(self, tiles, r):
-        if r - 1 >= 0:
-            new_tiles = swap_and_get_new_tiles(tiles, r, self.c0, r - 1, self.c0)
-            successor = Board(self, new_tiles, 'D{}{}'.format(self.r0 - r + 1, self.c0 + 1),
-                              diff_manhattan_dist_on_col(new_tiles, self.tiles, self.c0))
-            self.successors.append(successor)
-            self.slide_down_and_add_successors(new_tiles, r - 1)
-
-    def slide_up_and_add_successors(self, tiles, r):
-        if r + 1 < 4:
-            new_tiles = swap_and_get_new_tiles(tiles, r, self.c0, r + 1, self.c0)
-            successor = Board(self, new_tiles, 'U{}{}'.format(r - self.r0 + 1, self.c0 + 1),
-                              diff_manhattan_dist_on_col(new_tiles, self.tiles, self.c0))
-            self.successors.append(successor)
-            self.slide_up_and_add_successors(new_tiles, r + 1)
-
-    def slide_right_and_add_successors(self, tiles, c):
-        if c - 1 >= 0:
-            new_tiles = swap_and_get_new_tiles(tiles, self.r0, c, self.r0, c - 1)
-            successor = Board(self, new_tiles, 'R{}{}'.format(self.c0 - c + 1, self.r0 + 1),
-                              diff_manhattan_dist_on_row(new_tiles, self.tiles, self.r0))
-            self.successors.append(successor)
-            self.slide_right_and_add_successors(new_tiles, c - 1)
-
-    def slide_left_and_add_successors(self, tiles, c):
-        if c + 1 < 4:
-            new_tiles = swap_and_get_new_tiles(tiles, self.r0, c, self.r0, c + 1)
-            successor = Board(self, new_tiles, 'L{}{}'.format(c - self.c0 + 1, self.r0 + 1),
-                              diff_manhattan_dist_on_row(new_tiles, self.tiles, self.r0))
-            self.successors.append(successor)
-            self.slide_left_and_add_successors(new_tiles, c + 1)
-
-    def solution(self):
+                conflicts = calc_row_conflicts(packed, r, self.goal)
+                self.line_conflicts |= conflicts << (4 * r)
+                self.linear_conflicts += conflicts
+            for c in range(0, 4):
+                conflicts = calc_col_conflicts(packed, c, self.goal)
+                self.line_conflicts |= conflicts << (16 + 4 * c)
+                self.linear_conflicts += conflicts
+        else:
+            line_conflicts = prev.line_conflicts
+            linear_conflicts = prev.linear_conflicts
+            for r in range(min(prev.r0, r0), max(prev.r0, r0) + 1):
+                old = (line_conflicts >> (4 * r)) & 0xF
+                new = calc_row_conflicts(packed, r, self.goal)
+                line_conflicts ^= (old ^ new) << (4 * r)
+                linear_conflicts += new - old
+            for c in range(min(prev.c0, c0), max(prev.c0, c0) + 1):
+                old = (line_conflicts >> (16 + 4 * c)) & 0xF
+                new = calc_col_conflicts(packed, c, self.goal)
+                line_conflicts ^= (old ^ new) << (16 + 4 * c)
+                linear_conflicts += new - old
+            self.line_conflicts = line_conflicts
+            self.linear_conflicts = linear_conflicts
+
+        # pattern databases are exact for their tiles but linear conflicts charge 2 for every conflicting pair, which
+        # overestimates lines with several conflicts, so manhattan distance plus linear conflicts can be the larger
+        # of the two (see PATTERNS) and the larger one is used. The positions of the tiles are updated only for the
+        # slid tiles.
+        pattern_dbs = self.goal.pattern_dbs
+        if pattern_dbs is None:
+            self.positions = None
+            self.pattern_distance = 0
+        else:
+            if prev is None:
+                self.positions = calc_positions(packed)
+            else:
+                positions = prev.positions
+                for r in range(min(prev.r0, r0), max(prev.r0, r0) + 1):
+                    for c in range(min(prev.c0, c0), max(prev.c0, c0) + 1):
+                        shift = 4 * tile_at(packed, r, c)
+                        positions ^= (((positions >> shift) & 0xF) ^ (4 * r + c)) << shift
+                self.positions = positions
+            self.pattern_distance = calc_pattern_distance(self.positions, pattern_dbs)
+
+        self.priority = self.cost + max(self.pattern_distance, self.manhattan_distance + self.linear_conflicts)
+
+    # moves leading from the initial board to this one
+    def moves(self):
         ptr = self
         stack = []
         while ptr.prev is not None:
             stack.append(ptr.move)
             ptr = ptr.prev
         stack.reverse()
-        return ' '.join(move for move in stack)
+        return stack
+
+    def solution(self):
+        return ' '.join(format_move(move) for move in self.moves())
 
     def solution_with_info(self):
         ptr = self
@@ -195,8 +421,10 @@ class Board:
         stack.reverse()
         return '\n'.join(printable(board) for board in stack)
 
-    def same_as(self, other):
-        return self.tiles == other.tiles
+    # unpacked tiles, only needed for printing the board
+    @property
+    def tiles(self):
+        return unpack_tiles(self.packed)
 
 
 # read the input file for the input board
@@ -214,73 +442,207 @@ def read_file(file_path):
 
 # get board in a readable format
 def printable(board):
-    tiles_str = ''
+    parts = []
 
     for row in board.tiles:
         for col in row:
             if col == 0:
-                tiles_str += ' _ '
+                parts.append(' _ ')
             else:
-                tiles_str += '{:>2} '.format(col)
-        tiles_str += '\n'
-
-    tiles_str += 'Cost : {} Priority : {}, MD : {}, LC : {} Move : {}\n' \
-        .format(board.cost, board.priority, board.manhattan_distance, board.linear_conflicts, board.move)
+                parts.append('{:>2} '.format(col))
+        parts.append('\n')
 
-    return tiles_str
+    parts.append('Cost : {} Priority : {}, MD : {}, LC : {}, PD : {} Move : {}\n'
+                 .format(board.cost, board.priority, board.manhattan_distance, board.linear_conflicts,
+                         board.pattern_distance, 'Initial' if board.prev is None else format_move(board.move)))
 
+    return ''.join(parts)
 
-# check if the tiles are in the goal position
-def is_goal(board):
-    return board.tiles == goal_tiles
 
-
-# we can check if the puzzle is solvable or not in O(n^2) time using the method listed in
+# we can check if the puzzle is solvable or not using the method listed in
 # http://www.geeksforgeeks.org/check-instance-15-puzzle-solvable/
+# The inversions are counted in O(n log n) time with a Fenwick tree over the tile numbers: walking the board from the
+# last position to the first, every tile forms an inversion with each smaller tile already seen after it.
 def is_solvable(board):
-    flat_board = []
-    r0 = 0
-    for r in range(0, 4):
-        for c in range(0, 4):
-            flat_board.append(board.tiles[r][c])
-            if board.tiles[r][c] is 0:
-                r0 = r
-
+    seen = [0] * 16
     inversions = 0
-    for i in range(0, 16):
-        for j in range(i + 1, 16):
-            if flat_board[i] is not 0 and flat_board[j] is not 0 and flat_board[i] > flat_board[j]:
-                inversions += 1
-
-    if (r0 + inversions) % 2 is 1:
-        return True
-    else:
-        return False
+    for pos in range(15, -1, -1):
+        tile = (board.packed >> (4 * pos)) & 0xF
+        if tile == 0:
+            continue
+        i = tile - 1
+        while i > 0:
+            inversions += seen[i]
+            i -= i & -i
+        i = tile
+        while i < 16:
+            seen[i] += 1
+            i += i & -i
+
+    return (board.r0 + inversions) & 1 == 1
 
 
 # solve the board
 def solve(board):
-    fringe = []
-    heapq.heappush(fringe, (board.priority, board))
-
-    while len(fringe) is not 0:
-        min_p_board = heapq.heappop(fringe)[1]
-        if min_p_board.tiles == goal_tiles:
+    # Priorities are small non negative ints, so the fringe is an array of buckets holding a list of boards for every
+    # priority (Dial's algorithm). Pushing appends to the bucket of the board's priority and popping takes the last
+    # board of the lowest non empty bucket, both in O(1) where heapq needs O(log n) comparisons. The buckets grow when a
+    # priority doesn't fit. The heuristic can drop by more than 1 in a move, so a successor may have lesser priority
+    # than the board it came from and min_p moves back to it.
+    buckets = [[] for _ in range(0, 2 * board.priority + 1)]
+    buckets[board.priority].append(board)
+    min_p = board.priority
+    size = 1
+    # closed list of the boards already expanded, mapping packed board to the least cost it was reached with
+    closed = {}
+    # the search loop runs once per expanded board, so look the hot functions up once instead of on every use
+    closed_cost = closed.get
+    maxsize = sys.maxsize
+
+    while size != 0:
+        bucket = buckets[min_p]
+        while not bucket:
+            min_p += 1
+            bucket = buckets[min_p]
+        min_p_board = bucket.pop()
+        size -= 1
+        if min_p_board.packed == GOAL_PACKED:
             return min_p_board.solution()
-        for successor in min_p_board.get_successors():
-            # when considering the successors of a search node, don't enqueue a successor if its board is the same as
-            # the board of the previous search node. This is to avoid adding search nodes corresponding to the same
-            # board on the priority queue too many times. This critical optimization comes from
-            # http://coursera.cs.princeton.edu/algs4/assignments/8puzzle.html
-            if min_p_board.prev is None or not successor.same_as(min_p_board.prev):
-                heapq.heappush(fringe, (successor.priority, successor))
-
+        # the same board may have been pushed on the fringe more than once, expand it only if it was not reached with
+        # lesser or equal cost before
+        cost = min_p_board.cost
+        if closed_cost(min_p_board.packed, maxsize) <= cost:
+            continue
+        closed[min_p_board.packed] = cost
+        cost += 1
+        for packed, r0, c0, move, delta_md in expand(min_p_board.packed, min_p_board.r0, min_p_board.c0, GOAL,
+                                                     min_p_board.move):
+            # don't enqueue a successor whose board was already expanded with lesser or equal cost, which keeps the
+            # same boards from piling up on the priority queue. The check only needs the packed board, so it is done
+            # before paying for a Board.
+            if closed_cost(packed, maxsize) > cost:
+                successor = Board(min_p_board, packed, r0, c0, move, delta_md)
+                priority = successor.priority
+                if priority >= len(buckets):
+                    buckets.extend([] for _ in range(len(buckets), priority + 1))
+                buckets[priority].append(successor)
+                size += 1
+                if priority < min_p:
+                    min_p = priority
+
+
+# one half of the bidirectional search
+class Search:
+    __slots__ = ('fringe', 'closed')
+
+    def __init__(self, board, counter):
+        # fringe entries are (priority, tiebreak, board) as in heapq based A*
+        self.fringe = [(board.priority, next(counter), board)]
+        # closed list mapping packed board to the expanded board with the least cost, needed to join the two halves
+        self.closed = {}
+
+
+# Bidirectional search runs one A* forward from the initial board towards the goal and one backward from the goal
+# towards the initial board, which is possible because every slide can be undone by sliding the same tiles back.
+# The searches take turns expanding from whichever fringe is smaller and stop as soon as one of them reaches a board
+# already expanded by the other. Each half only needs to go about half as deep, and the fringe grows exponentially with
+# depth.
+def solve_bidirectional(board):
+    heappush = heapq.heappush
+    heappop = heapq.heappop
+    counter = itertools.count()
+    forward = Search(board, counter)
+    backward = Search(Board(None, GOAL_PACKED, 3, 3, None, 0, Goal(board.packed)), counter)
+
+    while forward.fringe and backward.fringe:
+        if len(forward.fringe) <= len(backward.fringe):
+            search, other = forward, backward
+        else:
+            search, other = backward, forward
+        fringe = search.fringe
+        closed = search.closed
+
+        min_p_board = heappop(fringe)[2]
+        if min_p_board.packed in other.closed:
+            return join_solutions(min_p_board, other.closed[min_p_board.packed])
+        if min_p_board.packed in closed and closed[min_p_board.packed].cost <= min_p_board.cost:
+            continue
+        closed[min_p_board.packed] = min_p_board
+        cost = min_p_board.cost + 1
+        for packed, r0, c0, move, delta_md in expand(min_p_board.packed, min_p_board.r0, min_p_board.c0,
+                                                     min_p_board.goal, min_p_board.move):
+            if packed not in closed or closed[packed].cost > cost:
+                successor = Board(min_p_board, packed, r0, c0, move, delta_md)
+                heappush(fringe, (successor.priority, next(counter), successor))
+
+
+# both boards are the same board reached by the two searches, one of them starting from the goal. The moves of the
+# backward half are undone in reverse order to continue from the meeting board to the goal.
+def join_solutions(board, other_board):
+    if board.goal is GOAL:
+        forward_board, backward_board = board, other_board
+    else:
+        forward_board, backward_board = other_board, board
+    moves = forward_board.moves() + [invert_move(move) for move in reversed(backward_board.moves())]
+    return ' '.join(format_move(move) for move in moves)
+
+
+# IDA* (iterative deepening A*) runs a depth first search which gives up on any board whose priority exceeds a
+# threshold. The threshold starts at the priority of the initial board and, whenever a search fails, is raised to the
+# least priority that exceeded it. Only the boards on the current path are kept in memory and there is no priority
+# queue at all.
+def solve_ida(board):
+    threshold = board.priority
+    while True:
+        goal_board, threshold = ida_search(board, threshold)
+        if goal_board is not None:
+            return goal_board.solution()
+
+
+# returns the goal board if it is reachable within the threshold, otherwise None and the least priority exceeding it
+def ida_search(board, threshold):
+    if board.priority > threshold:
+        return None, board.priority
+    if board.packed == GOAL_PACKED:
+        return board, threshold
+
+    successors = []
+    for packed, r0, c0, move, delta_md in expand(board.packed, board.r0, board.c0, GOAL, board.move):
+        successors.append(Board(board, packed, r0, c0, move, delta_md))
+    # trying the most promising successors first finds the goal sooner in the last iteration
+    successors.sort(key=lambda successor: successor.priority)
+
+    next_threshold = sys.maxsize
+    for successor in successors:
+        goal_board, exceeded = ida_search(successor, threshold)
+        if goal_board is not None:
+            return goal_board, exceeded
+        next_threshold = min(next_threshold, exceeded)
+    return None, next_threshold
+
+
+SOLVERS = {'astar': solve, 'bidirectional': solve_bidirectional, 'ida': solve_ida}
+
+# get the file path from script parameters, optionally followed by the search algorithm (astar, bidirectional or ida,
+# astar by default) and 'pdb' to use the pattern database heuristic
+USAGE = 'usage: solver16.py <board file> [astar | bidirectional | ida] [pdb]'
+
+if len(sys.argv) < 2 or any(option not in SOLVERS and option != 'pdb' for option in sys.argv[2:]) \
+        or sum(option in SOLVERS for option in sys.argv[2:]) > 1:
+    sys.exit(USAGE)
+
+solver = solve
+for option in sys.argv[2:]:
+    if option == 'pdb':
+        GOAL.pattern_dbs = load_pattern_dbs()
+    else:
+        solver = SOLVERS[option]
 
-# get the file path from script parameters
-initial_tiles = read_file(sys.argv[1])
-initial_board = Board(None, initial_tiles, 'Initial', 0)
+initial_packed = pack_tiles(read_file(sys.argv[1]))
+initial_r0, initial_c0 = find_empty_tile(initial_packed)
+initial_board = Board(None, initial_packed, initial_r0, initial_c0, None, 0)
 
 if is_solvable(initial_board):
-    print solve(initial_board)
+    print(solver(initial_board))
 else:
-    print 'No solution possible'
+    print('No solution possible')